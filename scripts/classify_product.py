@@ -1,12 +1,73 @@
+import copy
+import functools
 import json
+import re
 
-def classify_product(product_name, config_path="data/product_classes.json"):
-    product = product_name.lower()
+try:
+    import ahocorasick  # pyahocorasick, optional
+except ImportError:
+    ahocorasick = None
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@functools.lru_cache(maxsize=None)
+def _load_classes(config_path):
+    # Parsed once per config file; keywords are compiled into one automaton so
+    # a product is matched against all classes in a single scan.
     with open(config_path, "r", encoding="utf-8") as f:
         classes = json.load(f)
 
-    for cls, info in classes.items():
-        for kw in info["keywords"]:
+    entries = list(classes.items())
+    keywords = [(rank, kw.lower()) for rank, (_, info) in enumerate(entries) for kw in info["keywords"]]
+
+    automaton = None
+    by_token = None
+    if ahocorasick is not None and keywords:
+        automaton = ahocorasick.Automaton()
+        for rank, kw in keywords:
+            # A keyword shared by several classes keeps the first (highest-priority) one
+            if kw not in automaton:
+                automaton.add_word(kw, rank)
+        automaton.make_automaton()
+    else:
+        # Fallback only: single-word keywords -> class rank, for an O(1) lookup per product token
+        by_token = {}
+        for rank, kw in keywords:
+            if _TOKEN_RE.fullmatch(kw):
+                by_token.setdefault(kw, rank)
+    return entries, keywords, by_token, automaton
+
+
+def classify_product(product_name, config_path="data/product_classes.json"):
+    product = product_name.lower()
+    entries, keywords, by_token, automaton = _load_classes(config_path)
+
+    best = len(entries)
+    if automaton is not None:
+        # One scan finds every keyword; classes keep their config-file priority,
+        # so the earliest class with any hit wins (and rank 0 cannot be beaten)
+        for _, rank in automaton.iter(product):
+            if rank < best:
+                best = rank
+                if best == 0:
+                    break
+    else:
+        # Without the automaton: whole-token hits via dict lookup ("beta-carotene" -> "beta", "carotene")
+        ranks = [by_token[t] for t in _TOKEN_RE.findall(product) if t in by_token]
+        if ranks:
+            best = min(ranks)
+        # An earlier class can still win through a substring or multi-word keyword,
+        # so only keywords ranked above the token hit need the substring scan
+        for rank, kw in keywords:
+            if rank >= best:
+                break
             if kw in product:
-                return cls, info
+                best = rank
+                break
+
+    if best < len(entries):
+        # entries are shared through the lru_cache: hand out a copy, as a fresh json.load did
+        cls, info = entries[best]
+        return cls, copy.deepcopy(info)
     return None, None
@@ -0,0 +1,27 @@
+# csv_utils.py
+# Goal: Write the small pipeline tables with the stdlib csv module instead of pandas.
+
+import csv
+from typing import Iterable, Sequence
+
+
+def write_list_csv(path: str, header: str, rows: Iterable[str]) -> None:
+    """
+    Write a one-column CSV (header + one value per row).
+    Output matches DataFrame({header: rows}).to_csv(path, index=False).
+    """
+    with open(path, "w", newline="", buffering=1 << 20, encoding="utf-8") as fh:
+        w = csv.writer(fh, lineterminator="\n")
+        w.writerow([header])
+        w.writerows([r] for r in rows)
+
+
+def write_rows_csv(path: str, header: Sequence[str], rows: Iterable[Sequence[object]]) -> None:
+    """
+    Write a header row followed by the given rows.
+    Output matches DataFrame(rows, columns=header).to_csv(path, index=False).
+    """
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        w = csv.writer(fh, lineterminator="\n")
+        w.writerow(header)
+        w.writerows(rows)
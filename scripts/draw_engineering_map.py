@@ -1,72 +1,91 @@
 # draw_engineering_map.py
 # Goal: Draw engineering route map for beta-carotene production in yeast
 
+import hashlib
 import os
-import networkx as nx
-import matplotlib.pyplot as plt
+from pathlib import Path
 
 OUTDIR = "outputs"
 
+# ===== Map definition =====
+# MVA pathway
+MVA_NODES = [
+    "ERG10", "ERG13", "HMG1/2",
+    "ERG12", "ERG8", "ERG19",
+    "IDI1", "ERG20", "BTS1"
+]
+
+# Heterologous carotenoid pathway
+CRT_NODES = ["crtE", "crtB", "crtI", "crtY"]
+
+# ===== Layout =====
+POS = {
+    "Acetyl-CoA": (-4, 0),
+    "ERG10": (-3, 0),
+    "ERG13": (-2.5, 0),
+    "HMG1/2": (-2, 0),
+    "ERG12": (-1.5, 0),
+    "ERG8": (-1, 0),
+    "ERG19": (-0.5, 0),
+    "IDI1": (0, 0),
+    "ERG20": (0.5, 0),
+    "BTS1": (1, 0),
+    "crtE": (1.8, 0),
+    "crtB": (2.4, 0),
+    "crtI": (3.0, 0),
+    "crtY": (3.6, 0),
+    "β-carotene": (4.4, 0),
+}
+
+
+def render_key():
+    # Map definition + this script's source, so edits to the drawing code also invalidate the PNG
+    src = Path(__file__).read_bytes()
+    return hashlib.sha1(repr((MVA_NODES, CRT_NODES, POS)).encode("utf-8") + src).hexdigest()
+
+
 def main():
+    outpath = os.path.join(OUTDIR, "beta_carotene_engineering_map.png")
+    hash_path = Path(outpath + ".hash")
+    key = render_key()
+    if os.path.exists(outpath) and hash_path.exists() and hash_path.read_text(encoding="utf-8") == key:
+        print(f"Engineering route map unchanged, cached at {outpath}")
+        return
+
+    # Only pay for the networkx/matplotlib imports when the map has to be redrawn
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
     G = nx.DiGraph()
 
     # ===== Nodes =====
     # Precursors
     G.add_node("Acetyl-CoA", type="precursor")
 
-    # MVA pathway
-    mva_nodes = [
-        "ERG10", "ERG13", "HMG1/2",
-        "ERG12", "ERG8", "ERG19",
-        "IDI1", "ERG20", "BTS1"
-    ]
-
-    # Heterologous carotenoid pathway
-    crt_nodes = ["crtE", "crtB", "crtI", "crtY"]
-
     # Product
     G.add_node("β-carotene", type="product")
 
     # Add nodes
-    for n in mva_nodes:
+    for n in MVA_NODES:
         G.add_node(n, type="mva")
 
-    for n in crt_nodes:
+    for n in CRT_NODES:
         G.add_node(n, type="heterologous")
 
     # ===== Edges =====
     # MVA flow
     G.add_edge("Acetyl-CoA", "ERG10")
-    for i in range(len(mva_nodes) - 1):
-        G.add_edge(mva_nodes[i], mva_nodes[i + 1])
+    for i in range(len(MVA_NODES) - 1):
+        G.add_edge(MVA_NODES[i], MVA_NODES[i + 1])
 
     # Connect to heterologous pathway
     G.add_edge("BTS1", "crtE")
-    for i in range(len(crt_nodes) - 1):
-        G.add_edge(crt_nodes[i], crt_nodes[i + 1])
+    for i in range(len(CRT_NODES) - 1):
+        G.add_edge(CRT_NODES[i], CRT_NODES[i + 1])
 
     # Final product
     G.add_edge("crtY", "β-carotene")
 
-    # ===== Layout =====
-    pos = {
-        "Acetyl-CoA": (-4, 0),
-        "ERG10": (-3, 0),
-        "ERG13": (-2.5, 0),
-        "HMG1/2": (-2, 0),
-        "ERG12": (-1.5, 0),
-        "ERG8": (-1, 0),
-        "ERG19": (-0.5, 0),
-        "IDI1": (0, 0),
-        "ERG20": (0.5, 0),
-        "BTS1": (1, 0),
-        "crtE": (1.8, 0),
-        "crtB": (2.4, 0),
-        "crtI": (3.0, 0),
-        "crtY": (3.6, 0),
-        "β-carotene": (4.4, 0),
-    }
-
     # ===== Draw =====
     plt.figure(figsize=(16, 4))
 
@@ -84,7 +103,7 @@ def main():
 
     nx.draw(
         G,
-        pos,
+        POS,
         with_labels=True,
         node_color=node_colors,
         node_size=2500,
@@ -98,9 +117,9 @@ def main():
     plt.axis("off")
 
     os.makedirs(OUTDIR, exist_ok=True)
-    outpath = os.path.join(OUTDIR, "beta_carotene_engineering_map.png")
     plt.savefig(outpath, dpi=300, bbox_inches="tight")
     plt.close()
+    hash_path.write_text(key, encoding="utf-8")
 
     print(f"Engineering route map saved to {outpath}")
 
@@ -0,0 +1,201 @@
+# kegg_cache.py
+# Goal: Keep KEGG REST responses on local disk so repeated runs skip the network.
+# Used by kegg_demo.py and yeast_mapping.py
+
+import functools
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+BASE = "https://rest.kegg.jp"
+CACHE_DIR = ".kegg_cache"
+MAX_WORKERS = 8
+MIN_INTERVAL = 0.1   # seconds between two network requests, to stay inside KEGG's rate limit
+CHUNK_SIZE = 64 * 1024
+
+# One session for every KEGG call, so TCP/TLS is reused even on a cold cache.
+# Created by get_session() on the first network request; warm runs never import requests.
+_session = None
+_session_lock = threading.Lock()
+
+_throttle_lock = threading.Lock()
+_last_request = [0.0]
+
+# Toggled from the command line via configure()
+_settings = {"enabled": True, "refresh": False}
+
+
+def configure(enabled: bool = True, refresh: bool = False) -> None:
+    """
+    enabled=False -> always hit the network, never read or write the cache
+    refresh=True  -> hit the network and overwrite the cached copy
+    """
+    _settings["enabled"] = enabled
+    _settings["refresh"] = refresh
+
+
+def add_cache_args(ap) -> None:
+    ap.add_argument("--no-cache", action="store_true", help="Do not read or write the local KEGG cache.")
+    ap.add_argument("--refresh", action="store_true", help="Re-download KEGG entries and update the local cache.")
+
+
+def configure_from_args(args) -> None:
+    configure(enabled=not args.no_cache, refresh=args.refresh)
+
+
+def cache_path(key: str, dir: str = CACHE_DIR) -> Path:
+    return Path(dir) / (hashlib.sha1(key.encode("utf-8")).hexdigest() + ".txt")
+
+
+def _atomic_write(path: Path, write) -> None:
+    """
+    Call write(fh) on a fresh binary temp file next to `path`, then move it into place.
+    Each writer gets its own temp file, so concurrent writers of one key never collide
+    and a crash never leaves a half-written `path`.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            write(fh)
+        # mkstemp creates 0600 files; keep the mode of the file being replaced
+        os.chmod(tmp, path.stat().st_mode & 0o777 if path.exists() else 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _cache_hit(path: Path) -> bool:
+    # A cached copy exists and the settings allow serving it
+    return _settings["enabled"] and not _settings["refresh"] and path.exists()
+
+
+def disk_cache(dir: str = CACHE_DIR):
+    """
+    Cache the text returned by a KEGG wrapper, keyed by its REST path.
+    The wrapper name (kegg_find / kegg_link) gives the operation,
+    the positional args give the rest of the path, e.g. "link/sce/path:map00906".
+    """
+    def decorator(fn):
+        op = fn.__name__.replace("kegg_", "", 1)
+
+        @functools.wraps(fn)
+        def wrapper(*args: str) -> str:
+            if not _settings["enabled"]:
+                return fn(*args)
+
+            path = cache_path("/".join((op,) + args), dir)
+            if _cache_hit(path):
+                return path.read_text(encoding="utf-8")
+
+            text = fn(*args)
+            _atomic_write(path, lambda fh: fh.write(text.encode("utf-8")))
+            return text
+
+        return wrapper
+
+    return decorator
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            session = requests.Session()
+            session.headers["Accept-Encoding"] = "gzip, deflate"
+            # Pool sized to the kegg_link_many workers; transient KEGG errors are retried with backoff
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS, max_retries=retry)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _throttle() -> None:
+    # Space out request start times across all worker threads
+    with _throttle_lock:
+        wait = _last_request[0] + MIN_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _last_request[0] = time.monotonic()
+
+
+def _rest_get(path: str) -> str:
+    _throttle()
+    r = get_session().get(f"{BASE}/{path}", timeout=30)
+    r.raise_for_status()
+    return r.text
+
+
+def _stream_get(path: str, fh) -> None:
+    # Copy the body of GET <path> into fh in CHUNK_SIZE pieces
+    _throttle()
+    with get_session().get(f"{BASE}/{path}", stream=True, timeout=30) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True   # undo gzip/deflate transfer encoding
+        shutil.copyfileobj(r.raw, fh, CHUNK_SIZE)
+
+
+def kegg_get_to_file(entry: str, path: str, dir: str = CACHE_DIR) -> None:
+    """
+    Save get/<entry> to `path`, streaming the response instead of building it as a str.
+    The "get/<entry>" cache key is only filled here and holds the raw response bytes,
+    so a cache hit is a plain file copy. `path` is only replaced once it is complete.
+    """
+    def fetch(fh):
+        _stream_get(f"get/{entry}", fh)
+
+    if not _settings["enabled"]:
+        _atomic_write(Path(path), fetch)
+        return
+
+    cached = cache_path(f"get/{entry}", dir)
+    if not _cache_hit(cached):
+        _atomic_write(cached, fetch)
+    with open(cached, "rb") as src:
+        _atomic_write(Path(path), lambda fh: shutil.copyfileobj(src, fh, CHUNK_SIZE))
+
+
+@disk_cache()
+def kegg_find(db: str, query: str) -> str:
+    return _rest_get(f"find/{db}/{query}")
+
+
+@disk_cache()
+def kegg_link(target_db: str, source: str) -> str:
+    """
+    KEGG link API:
+      /link/<target_db>/<source>
+    Example:
+      /link/sce/path:map00906  -> list of sce genes linked to that pathway (if any)
+      /link/enzyme/path:map00906 -> EC numbers in pathway
+      /link/reaction/path:map00906 -> reactions in pathway
+    """
+    return _rest_get(f"link/{target_db}/{source}")
+
+
+def kegg_link_many(queries: List[Tuple[str, str]]) -> List[str]:
+    """
+    Run several independent kegg_link(target_db, source) calls concurrently.
+    Results come back in the same order as the input; cached entries never touch the network.
+    """
+    if not queries:
+        return []
+    # Duplicate queries are fetched once
+    unique = list(dict.fromkeys(queries))
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(unique))) as ex:
+        results = dict(zip(unique, ex.map(lambda req: kegg_link(*req), unique)))
+    return [results[q] for q in queries]
@@ -3,49 +3,21 @@
 #   python kegg_demo.py
 # Optional:
 #   python kegg_demo.py --product "beta-carotene" --outdir outputs
+#   python kegg_demo.py --refresh      (re-download, update .kegg_cache/)
+#   python kegg_demo.py --no-cache     (always hit rest.kegg.jp)
 
 import argparse
+import csv
+import io
 import os
 import re
-from typing import List, Dict, Tuple
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
 
-import requests
-import pandas as pd
-
-BASE = "https://rest.kegg.jp"
-
-
-def kegg_get(entry: str) -> str:
-    r = requests.get(f"{BASE}/get/{entry}", timeout=30)
-    r.raise_for_status()
-    return r.text
-
-
-def kegg_find(db: str, query: str) -> str:
-    r = requests.get(f"{BASE}/find/{db}/{query}", timeout=30)
-    r.raise_for_status()
-    return r.text
-
-
-def parse_kegg_section(text: str, section: str) -> List[str]:
-    """
-    Extract a SECTION from KEGG flat file.
-    Returns a list of stripped lines belonging to that section.
-    """
-    lines = text.splitlines()
-    collecting = False
-    out = []
-    for line in lines:
-        if line.startswith(section):
-            collecting = True
-            out.append(line[len(section):].strip())
-        elif collecting:
-            if line.startswith(" "):
-                out.append(line.strip())
-            else:
-                break
-    # Flatten possible empty items
-    return [x for x in out if x]
+import kegg_cache
+from csv_utils import write_list_csv, write_rows_csv
+from kegg_cache import kegg_find, kegg_get_to_file
+from kegg_parse import parse_sections
 
 
 def parse_find_hits(find_text: str) -> List[Tuple[str, str]]:
@@ -53,12 +25,10 @@ def parse_find_hits(find_text: str) -> List[Tuple[str, str]]:
     Parse KEGG 'find' output: <id>\t<name>
     """
     hits = []
-    for line in find_text.splitlines():
-        if not line.strip():
-            continue
-        parts = line.split("\t", 1)
-        if len(parts) == 2:
-            hits.append((parts[0].strip(), parts[1].strip()))
+    # Plain TSV (no quoting); a description containing further tabs is kept whole
+    for row in csv.reader(io.StringIO(find_text), delimiter="\t", quoting=csv.QUOTE_NONE):
+        if len(row) >= 2:
+            hits.append((row[0].strip(), "\t".join(row[1:]).strip()))
     return hits
 
 
@@ -69,9 +39,11 @@ def choose_best_compound_id(product_query: str, hits: List[Tuple[str, str]]) ->
     - Else return the first hit
     """
     q = product_query.strip().lower()
+    # q is already lower-cased, so one compiled pattern serves every hit
+    pattern = re.compile(rf"\b{re.escape(q)}\b")
     for cid, desc in hits:
         # desc usually starts with primary name; try exact word boundary match
-        if re.search(rf"\b{re.escape(q)}\b", desc.lower()):
+        if pattern.search(desc.lower()):
             return cid
     if not hits:
         raise ValueError(f"No KEGG compound hits found for query: {product_query}")
@@ -83,14 +55,21 @@ def ensure_outdir(path: str) -> str:
     return path
 
 
-def main():
+def build_arg_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
     ap.add_argument("--product", default="beta-carotene", help="Compound name to search in KEGG.")
     ap.add_argument("--compound", default=None, help="Optional explicit KEGG compound id, e.g., cpd:C02094")
     ap.add_argument("--pathway", default="path:map00906", help="KEGG pathway id, e.g., path:map00906")
     ap.add_argument("--outdir", default="outputs", help="Output directory")
-    args = ap.parse_args()
+    kegg_cache.add_cache_args(ap)
+    return ap
 
+
+def run_kegg_demo(args: argparse.Namespace) -> Dict[str, object]:
+    """
+    Resolve the compound, fetch compound + pathway entries and write the demo outputs.
+    Returns the resolved ids and the raw pathway text so callers can reuse it in-process.
+    """
     outdir = ensure_outdir(args.outdir)
 
     # 1) Resolve compound id
@@ -115,51 +94,42 @@ def main():
         pathway_id = f"path:map{pathway_id}"
 
     # 2) Fetch entries
-    compound_txt = kegg_get(compound_id)
-    pathway_txt = kegg_get(pathway_id)
-
-    # Save raw
-    with open(os.path.join(outdir, "compound_raw.txt"), "w", encoding="utf-8") as f:
-        f.write(compound_txt)
-    with open(os.path.join(outdir, "pathway_raw.txt"), "w", encoding="utf-8") as f:
-        f.write(pathway_txt)
+    # Only the raw-file save is streamed: both files are read back in full for
+    # parsing, so this does not lower peak memory
+    compound_raw = os.path.join(outdir, "compound_raw.txt")
+    pathway_raw = os.path.join(outdir, "pathway_raw.txt")
+    kegg_get_to_file(compound_id, compound_raw)
+    kegg_get_to_file(pathway_id, pathway_raw)
+    compound_txt = Path(compound_raw).read_text(encoding="utf-8")
+    pathway_txt = Path(pathway_raw).read_text(encoding="utf-8")
 
     # 3) Parse key sections
-    comp_name_lines = parse_kegg_section(compound_txt, "NAME")
+    comp_name_lines = parse_sections(compound_txt, {"NAME"})["NAME"]
     comp_names = []
     for line in comp_name_lines:
         # NAME lines may contain multiple names separated by ';'
         comp_names.extend([x.strip() for x in line.split(";") if x.strip()])
 
-    pathway_name_lines = parse_kegg_section(pathway_txt, "NAME")
+    pathway_secs = parse_sections(pathway_txt, {"NAME", "ENZYME", "REACTION", "COMPOUND", "GENE"})
+    pathway_name_lines = pathway_secs["NAME"]
     pathway_name = pathway_name_lines[0] if pathway_name_lines else ""
 
-    enzymes = parse_kegg_section(pathway_txt, "ENZYME")
-    reactions = parse_kegg_section(pathway_txt, "REACTION")
-    compounds = parse_kegg_section(pathway_txt, "COMPOUND")
-    genes = parse_kegg_section(pathway_txt, "GENE")
+    enzymes = pathway_secs["ENZYME"]
+    reactions = pathway_secs["REACTION"]
+    compounds = pathway_secs["COMPOUND"]
+    genes = pathway_secs["GENE"]
 
     # 4) Build structured tables
-    summary = pd.DataFrame(
-        [{
-            "product_query": args.product,
-            "compound_id": compound_id,
-            "compound_names": "; ".join(comp_names[:20]),
-            "pathway_id": pathway_id,
-            "pathway_name": pathway_name
-        }]
+    write_rows_csv(
+        os.path.join(outdir, "summary.csv"),
+        ["product_query", "compound_id", "compound_names", "pathway_id", "pathway_name"],
+        [[args.product, compound_id, "; ".join(comp_names[:20]), pathway_id, pathway_name]],
     )
-    summary.to_csv(os.path.join(outdir, "summary.csv"), index=False, encoding="utf-8")
 
-    df_enz = pd.DataFrame({"enzyme": enzymes})
-    df_rxn = pd.DataFrame({"reaction": reactions})
-    df_cpd = pd.DataFrame({"pathway_compound": compounds})
-    df_gene = pd.DataFrame({"gene_line": genes})
-
-    df_enz.to_csv(os.path.join(outdir, "pathway_enzymes.csv"), index=False, encoding="utf-8")
-    df_rxn.to_csv(os.path.join(outdir, "pathway_reactions.csv"), index=False, encoding="utf-8")
-    df_cpd.to_csv(os.path.join(outdir, "pathway_compounds.csv"), index=False, encoding="utf-8")
-    df_gene.to_csv(os.path.join(outdir, "pathway_genes.csv"), index=False, encoding="utf-8")
+    write_list_csv(os.path.join(outdir, "pathway_enzymes.csv"), "enzyme", enzymes)
+    write_list_csv(os.path.join(outdir, "pathway_reactions.csv"), "reaction", reactions)
+    write_list_csv(os.path.join(outdir, "pathway_compounds.csv"), "pathway_compound", compounds)
+    write_list_csv(os.path.join(outdir, "pathway_genes.csv"), "gene_line", genes)
 
     # 5) Minimal markdown report
     report_md = os.path.join(outdir, "report.md")
@@ -180,6 +150,20 @@ def main():
     print(f"Compound: {compound_id}")
     print(f"Pathway : {pathway_id} {pathway_name}")
 
+    return {
+        "compound_id": compound_id,
+        "compound_names": comp_names,
+        "pathway_id": pathway_id,
+        "pathway_name": pathway_name,
+        "pathway_txt": pathway_txt,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, object]:
+    args = build_arg_parser().parse_args(argv)
+    kegg_cache.configure_from_args(args)
+    return run_kegg_demo(args)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,33 @@
+# kegg_parse.py
+# Goal: Parse KEGG flat files (get/<entry> output) into sections.
+# Shared by kegg_demo.py and yeast_mapping.py
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+# One match per line: an optional column-0 header (or the "///" entry terminator), then the body.
+# Continuation lines start with whitespace, so their header group is empty.
+_SECTION_RE = re.compile(r"^(?P<hdr>[A-Z_]+|///)?[ \t]*(?P<body>.*)$", re.M)
+
+
+def parse_sections(text: str, wanted: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+    """
+    Extract SECTIONs from a KEGG flat file in a single pass.
+    wanted: section names to keep (default: all). Every wanted name gets an entry, even if absent.
+    Returns {section: [stripped non-empty lines belonging to that section]}.
+    """
+    keep = None if wanted is None else set(wanted)
+    out = {name: [] for name in keep} if keep is not None else {}
+    current = None
+    for m in _SECTION_RE.finditer(text):
+        hdr = m.group("hdr")
+        if hdr:
+            current = hdr
+            if keep is None and hdr != "///":
+                out.setdefault(hdr, [])
+        if current not in out:
+            continue
+        body = m.group("body").strip()
+        if body:
+            out[current].append(body)
+    return out
@@ -1,26 +1,38 @@
 # run_expert_system.py
 # Unified entry point for the metabolic expert system
+# All steps run in this process, so the pathway flat file is fetched once
+# and the tables are handed over in memory.
 
 import argparse
-import subprocess
 import sys
+import traceback
 from classify_product import classify_product
+import draw_engineering_map
+import kegg_cache
+import kegg_demo
+import yeast_mapping
 
-def run(cmd):
-    print(f"\n[RUN] {' '.join(cmd)}")
-    ret = subprocess.run(cmd)
-    if ret.returncode != 0:
-        print("ERROR: command failed")
+def run(label, fn, *args, **kwargs):
+    print(f"\n[RUN] {label}")
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        # Same information a failing subprocess used to print: full traceback, then exit
+        traceback.print_exc()
+        print(f"ERROR: {label} failed")
         sys.exit(1)
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Metabolic Engineering Expert System"
     )
     parser.add_argument(
         "--product", required=True, help="Target product name (e.g. beta-carotene)"
     )
-    args = parser.parse_args()
+    kegg_cache.add_cache_args(parser)
+    args = parser.parse_args(argv)
+    # Every step runs in this process, so the cache settings are applied once here
+    kegg_cache.configure_from_args(args)
 
     product = args.product
     print(f"\n=== Expert system started for product: {product} ===")
@@ -36,15 +48,21 @@ def main():
     print(f"Notes: {info.get('notes', 'N/A')}")
 
     # 2) Run KEGG analysis (data layer)
-    run([sys.executable, "scripts/kegg_demo.py"])
+    # kegg_demo keeps its own defaults (beta-carotene), as when it ran as a subprocess
+    demo_args = kegg_demo.build_arg_parser().parse_args([])
+    demo = run("kegg_demo", kegg_demo.run_kegg_demo, demo_args)
 
     # 3) Run host feasibility & engineering logic
-    run([sys.executable, "scripts/yeast_mapping.py"])
+    # Reuse the pathway flat file fetched above instead of downloading it again
+    pathway_txt = demo["pathway_txt"] if demo["pathway_id"] == yeast_mapping.PATHWAY else None
+    mapping = run("yeast_mapping", yeast_mapping.run_yeast_mapping, pathway_txt)
 
     # 4) Draw engineering map
-    run([sys.executable, "scripts/draw_engineering_map.py"])
+    run("draw_engineering_map", draw_engineering_map.main)
 
+    df_ec = mapping["ec_to_sce_genes"]
     print("\n=== Expert system finished successfully ===")
+    print(f"Pathway: {demo['pathway_id']} {demo['pathway_name']} ({len(df_ec)} ECs mapped to {yeast_mapping.ORG})")
     print("Check outputs/ for reports, CSVs and engineering map.")
 
 if __name__ == "__main__":
@@ -2,114 +2,99 @@
 # Goal: Map carotenoid pathway genes to S. cerevisiae (sce) and mark missing steps.
 # Run:
 #   python scripts/yeast_mapping.py
+#   python scripts/yeast_mapping.py --refresh   (re-download, update .kegg_cache/)
 
+import argparse
+import csv
+import io
 import os
-import re
-import requests
-import pandas as pd
+import shutil
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import kegg_cache
+from csv_utils import write_list_csv
+from kegg_cache import kegg_get_to_file, kegg_link_many
+from kegg_parse import parse_sections
 
-BASE = "https://rest.kegg.jp"
 OUTDIR = "outputs"
 PATHWAY = "path:map00906"   # Carotenoid biosynthesis
 ORG = "sce"                 # Saccharomyces cerevisiae
+MVA_PRIORITIES = "data/mva_engineering_priorities.csv"   # gene, role, engineering_tag, recommended_action
 
 
-def kegg_get(entry: str) -> str:
-    r = requests.get(f"{BASE}/get/{entry}", timeout=30)
-    r.raise_for_status()
-    return r.text
+def _strip_ec(ec_id: str) -> str:
+    # "ec:2.5.1.32" -> "2.5.1.32"
+    return ec_id[3:] if ec_id.startswith("ec:") else ec_id
 
 
-def kegg_link(target_db: str, source: str) -> str:
-    """
-    KEGG link API:
-      /link/<target_db>/<source>
-    Example:
-      /link/sce/path:map00906  -> list of sce genes linked to that pathway (if any)
-      /link/enzyme/path:map00906 -> EC numbers in pathway
-      /link/reaction/path:map00906 -> reactions in pathway
-    """
-    r = requests.get(f"{BASE}/link/{target_db}/{source}", timeout=30)
-    r.raise_for_status()
-    return r.text
-
-
-def parse_section(text: str, section: str):
-    lines = text.splitlines()
-    collecting = False
-    out = []
-    for line in lines:
-        if line.startswith(section):
-            collecting = True
-            out.append(line[len(section):].strip())
-        elif collecting:
-            if line.startswith(" "):
-                out.append(line.strip())
-            else:
-                break
-    return [x for x in out if x]
-
-
-def parse_kegg_link_pairs(text: str):
+def parse_kegg_link_pairs(text: str) -> Iterator[Tuple[str, str]]:
     """
     Parse KEGG /link output lines: <source>\t<target>
+    Yields pairs lazily; wrap in list() if they are needed more than once.
     """
-    pairs = []
-    for line in text.splitlines():
-        if not line.strip():
-            continue
-        a, b = line.split("\t")
-        pairs.append((a.strip(), b.strip()))
-    return pairs
+    # KEGG link output is plain TSV (no quoting), so let the C csv reader split it
+    for row in csv.reader(io.StringIO(text), delimiter="\t", quoting=csv.QUOTE_NONE):
+        if len(row) == 2:
+            yield row[0].strip(), row[1].strip()
 
 
 def ensure_outdir():
     os.makedirs(OUTDIR, exist_ok=True)
 
 
-def main():
+def run_yeast_mapping(pathway_txt: Optional[str] = None) -> Dict[str, object]:
+    """
+    Map PATHWAY onto ORG and write the mapping + engineering outputs.
+    pathway_txt: flat file already fetched by the caller (e.g. kegg_demo); fetched here if None.
+    Returns the tables that were written, so callers can use them without re-reading the CSVs.
+    """
+    import pandas as pd
+
     ensure_outdir()
 
     # 1) Fetch pathway flat file for reference + save
-    pathway_txt = kegg_get(PATHWAY)
-    with open(os.path.join(OUTDIR, "pathway_raw.txt"), "w", encoding="utf-8") as f:
-        f.write(pathway_txt)
-
-    pathway_name = (parse_section(pathway_txt, "NAME") or [""])[0]
-
-    # 2) Get EC list from flat file (already parsed by your previous script, but we recompute)
-    enzyme_lines = parse_section(pathway_txt, "ENZYME")
-    ec_list = []
-    for line in enzyme_lines:
-        # could be like "1.3.99.31 1.3.99.32"
-        for token in re.split(r"\s+", line.strip()):
-            token = token.replace("EC:", "").strip()
-            if re.match(r"^\d+\.\d+\.\d+\.\d+$", token):
-                ec_list.append(token)
-    ec_list = sorted(set(ec_list))
-
-    # 3) Link: pathway -> (sce genes)
+    if pathway_txt is None:
+        # Only the save is streamed; the file is read back in full for parsing
+        pathway_raw = os.path.join(OUTDIR, "pathway_raw.txt")
+        kegg_get_to_file(PATHWAY, pathway_raw)
+        pathway_txt = Path(pathway_raw).read_text(encoding="utf-8")
+
+    pathway_name = (parse_sections(pathway_txt, {"NAME"})["NAME"] or [""])[0]
+
+    # 2)-4) Three independent link calls, issued concurrently:
+    #   link/<org>/<pathway>     -> sce genes in pathway
+    #   link/enzyme/<pathway>    -> ECs in pathway (map-level flat files carry no ENZYME section)
+    #   link/enzyme/<org>        -> every sce gene -> EC annotation, intersected locally
+    # instead of one link/<org>/ec:<EC> request per EC.
+    sce_link_txt, path_ec_txt, org_ec_txt = kegg_link_many([
+        (ORG, PATHWAY),
+        ("enzyme", PATHWAY),
+        ("enzyme", ORG),
+    ])
+
     # If pathway truly has no native sce genes, this may be empty (which is itself informative).
-    sce_link_txt = kegg_link(ORG, PATHWAY)
-    sce_pairs = parse_kegg_link_pairs(sce_link_txt)
-    sce_genes = sorted({t for _, t in sce_pairs})  # like "sce:YJL167W"
-    df_sce = pd.DataFrame({"sce_gene": sce_genes})
-    df_sce.to_csv(os.path.join(OUTDIR, "sce_genes_in_pathway.csv"), index=False, encoding="utf-8")
-
-    # 4) For each EC in pathway, check whether sce has any gene annotated to that EC
-    # via: link/<org>/ec:<EC>
-    rows = []
+    sce_genes = sorted({t for _, t in parse_kegg_link_pairs(sce_link_txt)})  # like "sce:YJL167W"
+    write_list_csv(os.path.join(OUTDIR, "sce_genes_in_pathway.csv"), "sce_gene", sce_genes)
+
+    ec_list = sorted({_strip_ec(t) for _, t in parse_kegg_link_pairs(path_ec_txt)})
+
+    # Only keep the org annotations for ECs that are actually in the pathway
+    org_genes_by_ec: Dict[str, List[str]] = {ec: [] for ec in ec_list}
+    for gene, ec in parse_kegg_link_pairs(org_ec_txt):   # sce:xxxx  ec:x.x.x.x
+        ec = _strip_ec(ec)
+        if ec in org_genes_by_ec:
+            org_genes_by_ec[ec].append(gene)
+
+    # Columns are collected separately and handed to pandas in one go
+    ec_col, cnt_col, genes_col = [], [], []
     for ec in ec_list:
-        txt = kegg_link(ORG, f"ec:{ec}")
-        pairs = parse_kegg_link_pairs(txt)
-        genes = sorted({t for _, t in pairs})  # sce:xxxx
-        rows.append({
-            "ec": ec,
-            "sce_gene_count": len(genes),
-            "sce_genes": ";".join(genes[:50])  # cap
-        })
+        genes = sorted(set(org_genes_by_ec[ec]))  # sce:xxxx
+        ec_col.append(ec)
+        cnt_col.append(len(genes))
+        genes_col.append(";".join(genes[:50]))  # cap
 
-    df_ec = pd.DataFrame(rows)
+    df_ec = pd.DataFrame({"ec": ec_col, "sce_gene_count": cnt_col, "sce_genes": genes_col})
 
     if df_ec.empty:
         print("WARNING: No ECs mapped. This pathway is likely fully heterologous in yeast.")
@@ -124,78 +109,52 @@ def main():
     # Rule: If no native ECs mapped -> fully heterologous pathway
     fully_heterologous = df_ec.empty or (df_ec["sce_gene_count"].sum() == 0)
 
-    rows_rec = []
+    module_col, rec_gene_col, rec_role_col, conf_col = [], [], [], []
 
     if fully_heterologous:
         # Heterologous carotenoid module
-        for g in ["crtE", "crtB", "crtI", "crtY"]:
-            rows_rec.append({
-                "module_type": "heterologous",
-                "gene": g,
-                "role": "carotenoid biosynthesis core step",
-                "confidence": "high"
-            })
+        het_genes = ["crtE", "crtB", "crtI", "crtY"]
+        module_col += ["heterologous"] * len(het_genes)
+        rec_gene_col += het_genes
+        rec_role_col += ["carotenoid biosynthesis core step"] * len(het_genes)
+        conf_col += ["high"] * len(het_genes)
 
     # Native precursor (MVA) enhancement suggestions
-    for g in ["ERG10", "ERG13", "HMG1", "HMG2", "ERG12", "ERG8", "ERG19", "IDI1", "ERG20", "BTS1"]:
-        rows_rec.append({
-            "module_type": "native_enhancement",
-            "gene": g,
-            "role": "IPP/DMAPP/FPP/GGPP precursor supply (MVA pathway)",
-            "confidence": "medium"
-        })
-
-    df_rec = pd.DataFrame(rows_rec)
+    mva_enh_genes = ["ERG10", "ERG13", "HMG1", "HMG2", "ERG12", "ERG8", "ERG19", "IDI1", "ERG20", "BTS1"]
+    module_col += ["native_enhancement"] * len(mva_enh_genes)
+    rec_gene_col += mva_enh_genes
+    rec_role_col += ["IPP/DMAPP/FPP/GGPP precursor supply (MVA pathway)"] * len(mva_enh_genes)
+    conf_col += ["medium"] * len(mva_enh_genes)
+
+    df_rec = pd.DataFrame({
+        "module_type": module_col,
+        "gene": rec_gene_col,
+        "role": rec_role_col,
+        "confidence": conf_col,
+    })
     df_rec.to_csv(os.path.join(OUTDIR, "engineering_recommendations.csv"),
                 index=False, encoding="utf-8")
 
-    # Append to report
-    with open(os.path.join(OUTDIR, "yeast_mapping_report.md"), "a", encoding="utf-8") as f:
-        f.write("\n## Engineering Recommendations\n\n")
-        if fully_heterologous:
-            f.write("- **Pathway feasibility**: Fully heterologous in *S. cerevisiae*\n")
-            f.write("- **Required heterologous module**: crtE / crtB / crtI / crtY\n")
-        else:
-            f.write("- **Pathway feasibility**: Partially native\n")
+    # Report section, written together with the rest of the report in step 5
+    rec_md = io.StringIO()
+    rec_md.write("\n## Engineering Recommendations\n\n")
+    if fully_heterologous:
+        rec_md.write("- **Pathway feasibility**: Fully heterologous in *S. cerevisiae*\n")
+        rec_md.write("- **Required heterologous module**: crtE / crtB / crtI / crtY\n")
+    else:
+        rec_md.write("- **Pathway feasibility**: Partially native\n")
 
-        f.write("- **Native precursor enhancement (MVA pathway)**:\n")
-        f.write("  ERG10, ERG13, HMG1/2, ERG12, ERG8, ERG19, IDI1, ERG20, BTS1\n")
-        f.write("- **Risk notes**: NADPH demand, membrane burden, sterol competition\n")
+    rec_md.write("- **Native precursor enhancement (MVA pathway)**:\n")
+    rec_md.write("  ERG10, ERG13, HMG1/2, ERG12, ERG8, ERG19, IDI1, ERG20, BTS1\n")
+    rec_md.write("- **Risk notes**: NADPH demand, membrane burden, sterol competition\n")
 
     print("Engineering recommendations written to outputs/engineering_recommendations.csv")
 
     
 
     # === MVA pathway expert annotation ===
-
-    mva_genes = [
-        ("ERG10", "Acetyl-CoA acetyltransferase", "non-essential"),
-        ("ERG13", "HMG-CoA synthase", "non-essential"),
-        ("HMG1", "HMG-CoA reductase", "rate-limiting"),
-        ("HMG2", "HMG-CoA reductase isozyme", "rate-limiting"),
-        ("ERG12", "Mevalonate kinase", "essential"),
-        ("ERG8",  "Phosphomevalonate kinase", "essential"),
-        ("ERG19", "Mevalonate diphosphate decarboxylase", "essential"),
-        ("IDI1",  "IPP isomerase", "important"),
-        ("ERG20", "FPP synthase", "branch-point"),
-        ("BTS1",  "GGPP synthase", "target-directing"),
-    ]
-
-    rows_mva = []
-    for g, role, tag in mva_genes:
-        rows_mva.append({
-            "gene": g,
-            "role": role,
-            "engineering_tag": tag,
-            "recommended_action": (
-                "overexpression" if tag in ["rate-limiting", "target-directing"]
-                else "fine-tuning"
-            )
-        })
-
-    df_mva = pd.DataFrame(rows_mva)
-    df_mva.to_csv(os.path.join(OUTDIR, "mva_engineering_priorities.csv"),
-                index=False, encoding="utf-8")
+    # Static expert table, shipped in data/ and copied as-is
+    shutil.copyfile(MVA_PRIORITIES, os.path.join(OUTDIR, "mva_engineering_priorities.csv"))
 
 
 
@@ -212,29 +171,49 @@ def main():
         present = pd.DataFrame()
 
 
-    with open(md_path, "w", encoding="utf-8") as f:
-        f.write(f"# Yeast mapping for {PATHWAY} {pathway_name}\n\n")
-        f.write(f"- ECs in pathway: {len(df_ec)}\n")
-        f.write(f"- ECs with >=1 *{ORG}* gene: {len(present)}\n")
-        f.write(f"- ECs with 0 *{ORG}* gene (likely heterologous needed): {len(missing)}\n\n")
+    buf = io.StringIO()
+    buf.write(f"# Yeast mapping for {PATHWAY} {pathway_name}\n\n")
+    buf.write(f"- ECs in pathway: {len(df_ec)}\n")
+    buf.write(f"- ECs with >=1 *{ORG}* gene: {len(present)}\n")
+    buf.write(f"- ECs with 0 *{ORG}* gene (likely heterologous needed): {len(missing)}\n\n")
 
-        f.write("## Likely heterologous-needed ECs (sce_gene_count = 0)\n\n")
-        if len(missing) == 0:
-            f.write("None.\n")
-        else:
-            for _, r in missing.iterrows():
-                f.write(f"- EC:{r['ec']}\n")
+    buf.write("## Likely heterologous-needed ECs (sce_gene_count = 0)\n\n")
+    if len(missing) == 0:
+        buf.write("None.\n")
+    else:
+        for ec in missing["ec"]:
+            buf.write(f"- EC:{ec}\n")
 
-        f.write("\n## Files generated\n\n")
-        f.write("- `sce_genes_in_pathway.csv`\n")
-        f.write("- `ec_to_sce_genes.csv`\n")
-        f.write("- `yeast_mapping_report.md`\n")
+    buf.write(rec_md.getvalue())
+
+    buf.write("\n## Files generated\n\n")
+    buf.write("- `sce_genes_in_pathway.csv`\n")
+    buf.write("- `ec_to_sce_genes.csv`\n")
+    buf.write("- `yeast_mapping_report.md`\n")
+
+    # One write for the whole report (previously the recommendations were appended
+    # before this file was opened with "w", so they were always overwritten)
+    Path(md_path).write_text(buf.getvalue(), encoding="utf-8")
 
     print("OK")
     print(f"Pathway: {PATHWAY} {pathway_name}")
     print(f"Outputs: {os.path.abspath(OUTDIR)}")
     print(f"EC total={len(df_ec)}, present_in_sce={len(present)}, missing_in_sce={len(missing)}")
 
+    return {
+        "pathway_name": pathway_name,
+        "sce_genes": sce_genes,
+        "ec_to_sce_genes": df_ec,
+        "engineering_recommendations": df_rec,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, object]:
+    ap = argparse.ArgumentParser()
+    kegg_cache.add_cache_args(ap)
+    args = ap.parse_args(argv)
+    kegg_cache.configure_from_args(args)
+    return run_yeast_mapping()
 
 
 if __name__ == "__main__":